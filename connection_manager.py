@@ -1,6 +1,8 @@
-import json
 import asyncio
-from typing import List, Dict, Any
+import orjson
+from collections import deque
+from time import monotonic
+from typing import List, Dict, Set, Any, Optional, Union
 from fastapi import WebSocket, WebSocketDisconnect
 import logging
 
@@ -8,18 +10,78 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INITIAL_LINES_CHUNK_SIZE = 256
+
+class CachedFrame:
+    """
+    A message that is serialized on first send and reused afterwards,
+    so the same frame going to many clients is only encoded once.
+    """
+    
+    __slots__ = ("message", "_text")
+    
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._text: Optional[str] = None
+    
+    def text(self) -> str:
+        """Get the serialized frame, encoding it on first access."""
+        if self._text is None:
+            self._text = orjson.dumps(self.message).decode("utf-8")
+        return self._text
+
+
+Frame = Union[Dict[str, Any], CachedFrame]
+
+
+def encode_frame(message: Frame) -> str:
+    """Serialize a message, reusing the cached encoding when available."""
+    if isinstance(message, CachedFrame):
+        return message.text()
+    return orjson.dumps(message).decode("utf-8")
+
+
+PONG_FRAME = CachedFrame({"type": "pong"})
+
+CONNECTED_FRAME = CachedFrame({
+    "type": "connection_status",
+    "status": "connected",
+    "message": "Successfully connected to log stream"
+})
+
+
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time log streaming.
     Handles connection lifecycle and broadcasting messages to all connected clients.
     """
     
-    def __init__(self):
+    def __init__(self, coalesce_interval: float = 0.005, tail_size: int = 10):
+        """
+        Initialize the connection manager.
         
-        self.active_connections: List[WebSocket] = []
+        Args:
+            coalesce_interval: How long to buffer new lines before
+                broadcasting them as a single frame (seconds)
+            tail_size: How many recently broadcast lines to keep in memory
+                for newly connected clients
+        """
+        self.active_connections: Set[WebSocket] = set()
         
         self.connection_info: Dict[WebSocket, Dict[str, Any]] = {}
         
+        
+        self.coalesce_interval = coalesce_interval
+        self._pending_lines: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        
+        self._tail: deque = deque(maxlen=tail_size)
+        self._tail_skip = 0
+        
+        
+        self._catching_up: Dict[WebSocket, List[str]] = {}
+        
     async def connect(self, websocket: WebSocket, client_info: Dict[str, Any] = None):
         """
         Accept a new WebSocket connection and add it to active connections.
@@ -30,76 +92,88 @@ class ConnectionManager:
         """
         try:
             await websocket.accept()
-            self.active_connections.append(websocket)
+            self.active_connections.add(websocket)
+            self._catching_up[websocket] = []
             
             
             if client_info:
                 self.connection_info[websocket] = client_info
             
-            logger.info(f"New connection established. Total connections: {len(self.active_connections)}")
+            logger.info("New connection established. Total connections: %d", len(self.active_connections))
             
         
-            await self.send_personal_message({
-                "type": "connection_status", 
-                "status": "connected",
-                "message": "Successfully connected to log stream"
-            }, websocket)
+            await self.send_personal_message(CONNECTED_FRAME, websocket)
             
         except Exception as e:
-            logger.error(f"Error accepting WebSocket connection: {e}")
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
+            logger.error("Error accepting WebSocket connection: %s", e)
+            self.active_connections.discard(websocket)
+            self._catching_up.pop(websocket, None)
             raise
     
     def disconnect(self, websocket: WebSocket):
         """
         Remove a WebSocket connection from active connections.
         
+        Safe to call more than once for the same connection; calls for a
+        connection that is not tracked are a no-op.
+        
         Args:
             websocket: The WebSocket connection to remove
         """
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            
-        if websocket in self.connection_info:
-            del self.connection_info[websocket]
+        if websocket not in self.active_connections:
+            return
+        
+        self.active_connections.remove(websocket)
+        self.connection_info.pop(websocket, None)
+        self._catching_up.pop(websocket, None)
             
-        logger.info(f"Connection disconnected. Total connections: {len(self.active_connections)}")
+        logger.info("Connection disconnected. Total connections: %d", len(self.active_connections))
     
-    async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
+    async def send_personal_message(self, message: Frame, websocket: WebSocket):
         """
         Send a message to a specific WebSocket connection.
         
+        A failed send drops the connection immediately. The socket is already
+        broken by then, so it does not matter that this happens before the
+        endpoint's own cleanup calls disconnect again.
+        
         Args:
-            message: Dictionary message to send
+            message: Dictionary message or CachedFrame to send
             websocket: Target WebSocket connection
         """
         try:
-            await websocket.send_text(json.dumps(message))
+            await websocket.send_text(encode_frame(message))
         except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
+            logger.error("Error sending personal message: %s", e)
             
             self.disconnect(websocket)
     
-    async def broadcast_message(self, message: Dict[str, Any]):
+    async def broadcast_message(self, message: Frame):
         """
         Broadcast a message to all active WebSocket connections.
         
+        Clients that are still receiving their initial lines are skipped;
+        new lines reach them once their initial lines have been sent.
+        
         Args:
-            message: Dictionary message to broadcast
+            message: Dictionary message or CachedFrame to broadcast
         """
-        if not self.active_connections:
+        connections = [c for c in self.active_connections if c not in self._catching_up]
+        if not connections:
             return
         
-        message_json = json.dumps(message)
+        message_json = encode_frame(message)
         disconnected_connections = []
         
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                logger.error(f"Error broadcasting to connection: {e}")
+        results = await asyncio.gather(
+            *(connection.send_text(message_json) for connection in connections),
+            return_exceptions=True
+        )
+        
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.error("Error broadcasting to connection: %s", result)
                 
                 disconnected_connections.append(connection)
         
@@ -108,7 +182,7 @@ class ConnectionManager:
             self.disconnect(connection)
         
         if disconnected_connections:
-            logger.info(f"Cleaned up {len(disconnected_connections)} broken connections")
+            logger.info("Cleaned up %d broken connections", len(disconnected_connections))
     
     async def broadcast_new_lines(self, lines: List[str]):
         """
@@ -119,34 +193,146 @@ class ConnectionManager:
         """
         if not lines:
             return
+        
+        self._pending_lines.extend(lines)
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after(self.coalesce_interval))
+    
+    async def _flush_after(self, delay: float):
+        """
+        Wait for more lines to arrive, then broadcast everything that
+        was buffered as a single new_lines frame. Keeps flushing while
+        lines keep arriving during a broadcast, so frames stay in order.
+        
+        Args:
+            delay: How long to wait before each flush (seconds)
+        """
+        while self._pending_lines:
+            await asyncio.sleep(delay)
             
-        message = {
+            lines = self._pending_lines
+            self._pending_lines = []
+            self._tail.extend(lines[self._tail_skip:])
+            self._tail_skip = 0
+            for backlog in self._catching_up.values():
+                backlog.extend(lines)
+            
+            await self.broadcast_message(self._new_lines_frame(lines))
+            logger.info("Broadcasted %d new lines to %d clients", len(lines), len(self.active_connections))
+    
+    def _new_lines_frame(self, lines: List[str]) -> CachedFrame:
+        """Build a new_lines frame for the given lines."""
+        return CachedFrame({
             "type": "new_lines",
             "lines": lines,
-            "timestamp": asyncio.get_event_loop().time(),
+            "timestamp": monotonic(),
             "count": len(lines)
-        }
+        })
+    
+    async def close(self, timeout: float = 1.0):
+        """
+        Flush any buffered lines before shutdown.
+        
+        Waits for the pending flush task to broadcast what it holds, and
+        cancels it if that takes longer than timeout seconds.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            return
         
-        await self.broadcast_message(message)
-        logger.info(f"Broadcasted {len(lines)} new lines to {len(self.active_connections)} clients")
+        try:
+            await asyncio.wait_for(self._flush_task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out flushing %d buffered lines", len(self._pending_lines))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._flush_task = None
     
     async def send_initial_lines(self, lines: List[str], websocket: WebSocket):
         """
         Send initial log lines to a newly connected client.
         
+        Up to INITIAL_LINES_CHUNK_SIZE lines go out as a single initial_lines
+        frame. Larger backlogs are split into initial_lines_chunk frames
+        numbered by "seq", with "final" set on the last one, so they do not
+        have to be encoded and sent as one message.
+        
+        The client gets no new_lines broadcasts until its initial lines are
+        sent. Lines flushed in the meantime are sent right after them, so
+        the client sees everything in order.
+        
         Args:
             lines: List of initial log lines
             websocket: Target WebSocket connection
         """
-        message = {
-            "type": "initial_lines",
-            "lines": lines,
-            "timestamp": asyncio.get_event_loop().time(),
-            "count": len(lines)
-        }
+        if websocket not in self.active_connections:
+            return
+        self._catching_up[websocket] = []
         
-        await self.send_personal_message(message, websocket)
-        logger.info(f"Sent {len(lines)} initial lines to new client")
+        timestamp = monotonic()
+        
+        if len(lines) <= INITIAL_LINES_CHUNK_SIZE:
+            await self.send_personal_message({
+                "type": "initial_lines",
+                "lines": lines,
+                "timestamp": timestamp,
+                "count": len(lines)
+            }, websocket)
+        else:
+            for start in range(0, len(lines), INITIAL_LINES_CHUNK_SIZE):
+                chunk = lines[start:start + INITIAL_LINES_CHUNK_SIZE]
+                await self.send_personal_message({
+                    "type": "initial_lines_chunk",
+                    "lines": chunk,
+                    "timestamp": timestamp,
+                    "count": len(chunk),
+                    "seq": start // INITIAL_LINES_CHUNK_SIZE,
+                    "final": start + INITIAL_LINES_CHUNK_SIZE >= len(lines)
+                }, websocket)
+                if websocket not in self.active_connections:
+                    return
+        
+        backlog = self._catching_up.get(websocket)
+        while backlog:
+            self._catching_up[websocket] = []
+            await self.send_personal_message(self._new_lines_frame(backlog), websocket)
+            backlog = self._catching_up.get(websocket)
+        self._catching_up.pop(websocket, None)
+        
+        logger.info("Sent %d initial lines to new client", len(lines))
+    
+    def reset_tail(self, lines: List[str], tail_size: int):
+        """
+        Replace the in-memory tail with the given lines.
+        
+        Args:
+            lines: Last lines of the log file
+            tail_size: How many lines to keep from now on
+        """
+        self._tail = deque(lines, maxlen=tail_size)
+    
+    def clear_tail(self):
+        """
+        Forget the in-memory tail once it stops matching the log, after the
+        log was truncated or replaced or a line was sent in parts.
+        
+        Lines that are still waiting to be flushed are broadcast as usual
+        but kept out of the new tail.
+        """
+        self._tail.clear()
+        self._tail_skip = len(self._pending_lines)
+    
+    def get_initial_lines(self, n: int) -> Optional[List[str]]:
+        """
+        Get the last n lines from the in-memory tail.
+        
+        Returns:
+            The lines, or None if the tail does not hold n lines
+        """
+        if n > len(self._tail):
+            return None
+        return list(self._tail)[-n:] if n > 0 else []
     
     def get_connection_count(self) -> int:
         """Get the number of active connections."""
@@ -1,12 +1,23 @@
 import asyncio
+import codecs
 import os
+import sys
 import logging
+from pathlib import Path
 from typing import Optional, Callable, List
-from utils import get_file_size, read_new_lines, ensure_log_file_exists
+from utils import split_complete_lines, find_line_end, ensure_log_file_exists, detect_file_encoding
+
+try:
+    from asyncinotify import Inotify, Mask
+except ImportError:
+    Inotify = None
+    Mask = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+KEEP_FILE_OPEN = os.name != "nt"
+
 class FileWatcher:
     """
     Asynchronous file watcher that monitors a log file for changes
@@ -16,22 +27,45 @@ class FileWatcher:
     def __init__(self, 
                  file_path: str, 
                  poll_interval: float = 0.1,
-                 callback: Optional[Callable[[List[str]], None]] = None):
+                 callback: Optional[Callable[[List[str]], None]] = None,
+                 max_poll_interval: float = 1.0,
+                 reset_callback: Optional[Callable[[], None]] = None,
+                 partial_line_timeout: float = 0.5):
         """
         Initialize the file watcher.
         
         Args:
             file_path: Path to the file to monitor
-            poll_interval: How often to check for changes (seconds)
+            poll_interval: How often to check for changes while active (seconds)
             callback: Async function to call when new lines are detected
+            max_poll_interval: Upper bound the interval backs off to while idle (seconds)
+            reset_callback: Function to call when lines already passed to
+                callback stop matching the lines in the file, either because
+                the file was truncated or replaced or because a line was sent
+                in parts
+            partial_line_timeout: How long a line without a newline is held
+                back before it is sent as it is (seconds)
         """
         self.file_path = file_path
         self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self.current_interval = poll_interval
         self.callback = callback
+        self.reset_callback = reset_callback
+        self.partial_line_timeout = partial_line_timeout
         
         
         self.last_size = 0
         self.last_position = 0
+        self.encoding: Optional[str] = None
+        self.decoder: Optional[codecs.IncrementalDecoder] = None
+        self.partial_line = ""
+        self.partial_sent = False
+        self.partial_task: Optional[asyncio.Task] = None
+        
+        
+        self.fd: Optional[int] = None
+        self.inode: Optional[int] = None
         
         
         self.is_running = False
@@ -47,8 +81,12 @@ class FileWatcher:
         await ensure_log_file_exists(self.file_path)
         
         
-        self.last_size = get_file_size(self.file_path)
+        self._open_file()
+        self.last_size = os.stat(self.file_path).st_size
         self.last_position = self.last_size
+        self.encoding = detect_file_encoding(self.file_path) if self.last_size else None
+        if self.encoding in ("utf-8", "utf-8-sig"):
+            self.last_position = find_line_end(self.file_path, self.last_size)
         
         self.is_running = True
         self.task = asyncio.create_task(self._watch_loop())
@@ -70,41 +108,162 @@ class FileWatcher:
             except asyncio.CancelledError:
                 pass
         
+        if self.partial_task:
+            self.partial_task.cancel()
+            self.partial_task = None
+        
+        self._close_file()
+        
         logger.info("File watcher stopped")
     
+    def _open_file(self):
+        """
+        Open the file and remember its inode so rotation can be detected.
+        
+        On Windows the file is not held open, since a handle opened there
+        without delete sharing stops the writer from renaming or deleting
+        the log. Only the inode is recorded and each read opens the file.
+        """
+        self._close_file()
+        if KEEP_FILE_OPEN:
+            self.fd = os.open(self.file_path, os.O_RDONLY)
+            self.inode = os.fstat(self.fd).st_ino
+        else:
+            self.inode = os.stat(self.file_path).st_ino
+    
+    def _close_file(self):
+        """Close the file descriptor if it is open."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.inode = None
+    
+    def _read(self, size: int, offset: int) -> bytes:
+        """Read size bytes at offset, through the open descriptor if there is one."""
+        if self.fd is not None:
+            return os.pread(self.fd, size, offset)
+        with open(self.file_path, 'rb') as file:
+            file.seek(offset)
+            return file.read(size)
+    
     async def _watch_loop(self):
         """Main monitoring loop."""
         try:
             while self.is_running:
-                await self._check_for_changes()
-                await asyncio.sleep(self.poll_interval)
+                if await self._check_for_changes():
+                    self.current_interval = self.poll_interval
+                else:
+                    self.current_interval = min(self.current_interval * 1.5, self.max_poll_interval)
+                await asyncio.sleep(self.current_interval)
         except asyncio.CancelledError:
             logger.info("File watcher loop cancelled")
         except Exception as e:
-            logger.error(f"Error in file watcher loop: {e}")
+            logger.error("Error in file watcher loop: %s", e)
             self.is_running = False
     
-    async def _check_for_changes(self):
-        """Check if the file has new content."""
+    async def _check_for_changes(self, path_changed: bool = True) -> bool:
+        """
+        Check if the file has new content.
+        
+        Args:
+            path_changed: Whether the path may now point at a different file.
+                When False and the file is open, the descriptor is stat'ed
+                directly, which skips the path lookup but cannot notice
+                rotation.
+        
+        Returns:
+            True if the file changed since the last check
+        """
         try:
-            current_size = get_file_size(self.file_path)
+            try:
+                if path_changed or self.fd is None:
+                    st = os.stat(self.file_path)
+                else:
+                    st = os.fstat(self.fd)
+            except FileNotFoundError:
+                return False
+            
+            if st.st_ino != self.inode:
+                logger.info("File was rotated or recreated, reopening")
+                self._open_file()
+                self._reset_position()
+            
+            current_size = st.st_size
             if current_size < self.last_size:
                 logger.info("File was truncated or recreated, resetting position")
-                self.last_position = 0
-                self.last_size = current_size
-                return
+                self._reset_position()
+                if not current_size:
+                    return True
 
             if current_size > self.last_size:
+                if self.decoder is None:
+                    if self.encoding is None:
+                        self.encoding = detect_file_encoding(self.file_path)
+                    self.decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+                    if self.encoding == "utf-16" and self.last_position:
+                        self.decoder.decode(self._read(2, 0))
                 
-                new_lines, new_position = read_new_lines(self.file_path, self.last_position)
+                data = self._read(current_size - self.last_position, self.last_position)
+                text = self.partial_line + self.decoder.decode(data)
+                new_lines, self.partial_line = split_complete_lines(text)
+                line_finished = self.partial_sent and self.partial_line != text
                 if new_lines and self.callback:
                     await self.callback(new_lines)
+                if line_finished:
+                    self.partial_sent = False
+                    if self.reset_callback:
+                        self.reset_callback()
                 self.last_size = current_size
-                self.last_position = new_position
+                self.last_position += len(data)
+                self._schedule_partial_flush()
                 if new_lines:
-                    logger.info(f"Detected {len(new_lines)} new lines")
+                    logger.debug("Detected %d new lines", len(new_lines))
+                return True
         except Exception as e:
-            logger.error(f"Error checking for file changes: {e}")
+            logger.error("Error checking for file changes: %s", e)
+        
+        return False
+    
+    def _reset_position(self):
+        """Start reading the file over from the beginning."""
+        self.last_position = 0
+        self.last_size = 0
+        self.encoding = None
+        self.decoder = None
+        self.partial_line = ""
+        self.partial_sent = False
+        self._schedule_partial_flush()
+        
+        if self.reset_callback:
+            self.reset_callback()
+    
+    def _schedule_partial_flush(self):
+        """Restart the timer that sends a held-back unterminated line."""
+        if self.partial_task:
+            self.partial_task.cancel()
+            self.partial_task = None
+        if self.partial_line.strip():
+            self.partial_task = asyncio.create_task(self._flush_partial_line())
+    
+    async def _flush_partial_line(self):
+        """
+        Send the held-back unterminated line once nothing more has been
+        written for partial_line_timeout, so a last line that never gets
+        its newline still reaches clients. The rest of the line is sent as
+        a line of its own once it is written.
+        """
+        await asyncio.sleep(self.partial_line_timeout)
+        self.partial_task = None
+        
+        line, self.partial_line = self.partial_line, ""
+        self.partial_sent = True
+        if self.callback:
+            await self.callback([line])
+    
+    def has_partial_line(self) -> bool:
+        """Whether the file ends in a line that has not been terminated yet."""
+        return (self.last_position < self.last_size or self.partial_sent
+                or bool(self.partial_line.strip()))
     
     def set_callback(self, callback: Callable[[List[str]], None]):
         """Set or update the callback function."""
@@ -118,5 +277,111 @@ class FileWatcher:
             "last_size": self.last_size,
             "last_position": self.last_position,
             "poll_interval": self.poll_interval,
+            "current_interval": self.current_interval,
+            "encoding": self.encoding,
+            "mode": "polling",
             "file_exists": os.path.exists(self.file_path)
-        }
\ No newline at end of file
+        }
+
+
+class InotifyFileWatcher(FileWatcher):
+    """
+    File watcher driven by Linux inotify events instead of polling.
+    Watches the parent directory so that the file being recreated or
+    rotated is picked up, and ignores events for any other entry.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 poll_interval: float = 0.1,
+                 callback: Optional[Callable[[List[str]], None]] = None,
+                 reset_callback: Optional[Callable[[], None]] = None,
+                 partial_line_timeout: float = 0.5):
+        super().__init__(file_path, poll_interval, callback,
+                         reset_callback=reset_callback,
+                         partial_line_timeout=partial_line_timeout)
+        self.inotify: Optional["Inotify"] = None
+
+    async def start(self):
+        """
+        Start monitoring the file.
+
+        The watch is added once the file is open, and the file is checked
+        once more afterwards to pick up anything written in between. If the
+        watch cannot be added, the watcher is stopped again.
+        """
+        if self.is_running:
+            logger.warning("File watcher is already running")
+            return
+
+        await super().start()
+
+        try:
+            self.inotify = Inotify()
+            self.inotify.add_watch(
+                Path(self.file_path).parent,
+                Mask.MODIFY | Mask.CREATE | Mask.MOVED_TO | Mask.MOVED_FROM | Mask.DELETE
+            )
+        except Exception:
+            await self.stop()
+            raise
+
+        await self._check_for_changes()
+
+    async def stop(self):
+        """Stop monitoring the file."""
+        await super().stop()
+
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
+
+    async def _watch_loop(self):
+        """Main monitoring loop, woken up by inotify events."""
+        basename = Path(self.file_path).name
+        try:
+            async for event in self.inotify:
+                if not self.is_running:
+                    break
+                if event.name is None or str(event.name) != basename:
+                    continue
+
+                if event.mask & (Mask.DELETE | Mask.MOVED_FROM):
+                    logger.info("File was deleted or moved away, closing it")
+                    self._close_file()
+                elif event.mask & (Mask.CREATE | Mask.MOVED_TO):
+                    await self._check_for_changes()
+                elif event.mask & Mask.MODIFY:
+                    await self._check_for_changes(path_changed=False)
+        except asyncio.CancelledError:
+            logger.info("File watcher loop cancelled")
+        except Exception as e:
+            logger.error("Error in file watcher loop: %s", e)
+            self.is_running = False
+
+    def get_status(self) -> dict:
+        """Get the current status of the file watcher."""
+        status = super().get_status()
+        del status["current_interval"]
+        status["mode"] = "inotify"
+        return status
+
+
+def create_file_watcher(file_path: str,
+                        poll_interval: float = 0.1,
+                        callback: Optional[Callable[[List[str]], None]] = None,
+                        max_poll_interval: float = 1.0,
+                        reset_callback: Optional[Callable[[], None]] = None,
+                        partial_line_timeout: float = 0.5) -> FileWatcher:
+    """
+    Create the best available file watcher for this platform.
+
+    Uses inotify on Linux when asyncinotify is installed, otherwise
+    falls back to the polling FileWatcher. max_poll_interval only
+    applies to the polling watcher.
+    """
+    if sys.platform == "linux" and Inotify is not None:
+        return InotifyFileWatcher(file_path, poll_interval, callback,
+                                  reset_callback, partial_line_timeout)
+    return FileWatcher(file_path, poll_interval, callback, max_poll_interval,
+                       reset_callback, partial_line_timeout)
@@ -2,10 +2,12 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from utils import read_last_n_lines, get_file_size
-from connection_manager import manager
-from file_watcher import FileWatcher
+from connection_manager import manager, PONG_FRAME
+from file_watcher import FileWatcher, create_file_watcher
 import os
+import sys
 import asyncio
+from pathlib import Path
 import logging
 
 
@@ -15,12 +17,19 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="Tail Web", version="1.0.0")
 
 
-app.mount("/static", StaticFiles(directory="C:\\Users\\Asus\\Desktop\\BrowserStack\\frontend"), name="static")
+FRONTEND_DIR = Path(os.getenv("FRONTEND_DIR", Path(__file__).resolve().parent.parent / "frontend"))
+
+app.mount("/static", StaticFiles(directory=FRONTEND_DIR, check_dir=False), name="static")
 
 
 LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "c:\\Users\\Asus\\Desktop\\BrowserStack\\logs\\sample.log")
 INITIAL_LINES = int(os.getenv("INITIAL_LINES", "10"))
 POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "0.1"))
+MAX_POLL_INTERVAL = float(os.getenv("MAX_POLL_INTERVAL", "1.0"))
+
+
+HEARTBEAT_PING = b"\x01"
+HEARTBEAT_PONG = b"\x02"
 
 
 file_watcher: FileWatcher = None
@@ -33,13 +42,19 @@ async def startup_event():
     logger.info("Starting Tail Web Server...")
     
    
-    file_watcher = FileWatcher(
+    file_watcher = create_file_watcher(
         file_path=LOG_FILE_PATH,
         poll_interval=POLL_INTERVAL,
-        callback=manager.broadcast_new_lines
+        callback=manager.broadcast_new_lines,
+        max_poll_interval=MAX_POLL_INTERVAL,
+        reset_callback=manager.clear_tail
     )
     
     await file_watcher.start()
+    manager.reset_tail(
+        read_last_n_lines(LOG_FILE_PATH, INITIAL_LINES, end=file_watcher.last_position),
+        INITIAL_LINES
+    )
     logger.info("File watcher started successfully")
 
 @app.on_event("shutdown")  
@@ -52,6 +67,8 @@ async def shutdown_event():
     if file_watcher:
         await file_watcher.stop()
     
+    await manager.close()
+    
     logger.info("File watcher stopped")
 
 @app.get("/")
@@ -93,7 +110,8 @@ async def get_status():
         "config": {
             "log_file_path": LOG_FILE_PATH,
             "initial_lines": INITIAL_LINES,
-            "poll_interval": POLL_INTERVAL
+            "poll_interval": POLL_INTERVAL,
+            "max_poll_interval": MAX_POLL_INTERVAL
         }
     }
 
@@ -110,21 +128,24 @@ async def websocket_endpoint(websocket: WebSocket, n: int = Query(INITIAL_LINES)
         await manager.connect(websocket, client_info)
         
         
-        initial_lines = read_last_n_lines(LOG_FILE_PATH, n)
+        initial_lines = None
+        if file_watcher and not file_watcher.has_partial_line():
+            initial_lines = manager.get_initial_lines(n)
+        if initial_lines is None:
+            initial_lines = read_last_n_lines(LOG_FILE_PATH, n)
         await manager.send_initial_lines(initial_lines, websocket)
         
        
         while True:
-            try:
-                
-                data = await websocket.receive_text()
-                
-                
-                if data == "ping":
-                    await manager.send_personal_message({"type": "pong"}, websocket)
-                
-            except WebSocketDisconnect:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
                 break
+            
+            
+            if message.get("bytes") == HEARTBEAT_PING:
+                await websocket.send_bytes(HEARTBEAT_PONG)
+            elif message.get("text") == "ping":
+                await manager.send_personal_message(PONG_FRAME, websocket)
                 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected normally")
@@ -136,4 +157,10 @@ async def websocket_endpoint(websocket: WebSocket, n: int = Query(INITIAL_LINES)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        loop="asyncio" if sys.platform == "win32" else "uvloop"
+    )
\ No newline at end of file
@@ -1,48 +1,101 @@
 import os
 import asyncio
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from pathlib import Path
-import chardet 
+
+TAIL_BYTES_PER_LINE = 256
 
 def detect_file_encoding(file_path: str) -> str:
-    """Detect the encoding of a file."""
+    """Detect the encoding of a file from its byte order mark, defaulting to UTF-8."""
     try:
         with open(file_path, 'rb') as file:
-            raw_data = file.read(min(10000, os.path.getsize(file_path)))
-            if raw_data:
-                detected = chardet.detect(raw_data)
-                encoding = detected.get('encoding', 'utf-8')
-                
-                if encoding and 'utf-16' in encoding.lower():
-                    return 'utf-16'
-                elif encoding and encoding.lower() in ['ascii', 'utf-8']:
-                    return 'utf-8'
-                else:
-                    return encoding or 'utf-8'
-    except:
+            head = file.read(4)
+        
+        if head.startswith(b'\xff\xfe') or head.startswith(b'\xfe\xff'):
+            return 'utf-16'
+        if head.startswith(b'\xef\xbb\xbf'):
+            return 'utf-8-sig'
+    except OSError:
         pass
     return 'utf-8'
 
-def read_last_n_lines(file_path: str, n: int = 10) -> list[str]:
-    """Efficiently read the last N lines from a potentially large file."""
+def _scan_tail(data, n: int, end: int, found: int, at_file_start: bool,
+               codec: str = 'utf-8', base: int = 0) -> Tuple[int, int, int]:
+    """
+    Count non-blank lines backwards through data[:end].
+    
+    The text before the first newline in data is only counted when data
+    begins at the start of the file, since otherwise it may be the end of a
+    longer line. The returned end and found let the scan resume once more
+    of the file has been read in front of data.
+    
+    In UTF-16 the newline is two bytes, and a match only counts when it
+    starts on a code unit boundary. base is the file offset of data[0].
+    
+    Returns:
+        Tuple of (start_of_nth_line or -1, end, found)
+    """
+    newline = '\n'.encode(codec) if codec.startswith('utf-16') else b'\n'
+    width = len(newline)
+    limit = end
+    while end > 0:
+        pos = data.rfind(newline, 0, limit)
+        if pos != -1 and (base + pos) % width:
+            limit = pos + width - 1
+            continue
+        if pos == -1 and not at_file_start:
+            break
+        line_start = pos + width if pos != -1 else 0
+        line = data[line_start:end]
+        if width > 1:
+            line = line.decode(codec, errors='replace').lstrip('\ufeff')
+        if line.strip():
+            found += 1
+            if found == n:
+                return line_start, end, found
+        end = limit = max(pos, 0)
+    return -1, end, found
+
+def read_last_n_lines(file_path: str, n: int = 10, end: Optional[int] = None) -> list[str]:
+    """
+    Efficiently read the last N lines from a potentially large file.
+    
+    Lines are decoded and split the same way the file watcher splits them.
+    When end is given, only the first end bytes of the file are considered.
+    """
     if not os.path.exists(file_path) or n <= 0:
         return []
-    buffer = bytearray()
-    chunk_size = 1024
+    encoding = codec = detect_file_encoding(file_path)
     with open(file_path, 'rb') as f:
-        f.seek(0, os.SEEK_END)
-        file_size = f.tell()
-        pointer = file_size
-        while pointer > 0 and buffer.count(b'\n') <= n:
-            read_size = min(chunk_size, pointer)
-            pointer -= read_size
-            f.seek(pointer)
-            buffer = f.read(read_size) + buffer
-    
-    lines = buffer.split(b'\n')
+        if encoding == 'utf-16':
+            codec = 'utf-16-be' if f.read(2) == b'\xfe\xff' else 'utf-16-le'
+        file_size = os.fstat(f.fileno()).st_size
+        if end is not None:
+            file_size = min(file_size, end)
+        if file_size == 0:
+            return []
+        
+        window = min(file_size, n * TAIL_BYTES_PER_LINE)
+        buffer = bytearray(window)
+        f.seek(file_size - window)
+        f.readinto(buffer)
+        end = window
+        found = 0
+        while True:
+            start, end, found = _scan_tail(buffer, n, end, found, window == file_size,
+                                           codec, file_size - window)
+            if start >= 0 or window == file_size:
+                break
+            grown = min(file_size, window * 2)
+            f.seek(file_size - grown)
+            buffer[:0] = f.read(grown - window)
+            end += grown - window
+            window = grown
+        tail = buffer[max(start, 0):]
+        if file_size - window + max(start, 0) == 0:
+            codec = encoding
     
-    result = [line.decode(errors='replace').rstrip('\r\n') for line in lines if line.strip()]
-    return result[-n:]
+    return decode_lines(tail, codec)[-n:]
 
 def get_file_size(file_path: str) -> int:
     """Get the current size of a file."""
@@ -51,48 +104,62 @@ def get_file_size(file_path: str) -> int:
     except (OSError, FileNotFoundError):
         return 0
 
-def read_new_lines(file_path: str, last_position: int) -> Tuple[List[str], int]:
+def split_complete_lines(text: str) -> Tuple[List[str], str]:
     """
-    Read new lines from a file starting from a given position.
+    Split text into complete lines and a trailing unterminated line.
     
     Args:
-        file_path: Path to the log file
-        last_position: Last known file position
+        text: Decoded file content
     
     Returns:
-        Tuple of (new_lines_list, new_position)
+        Tuple of (complete lines without terminators and with blank lines
+        removed, trailing text that has no line terminator yet)
     """
-    if not os.path.exists(file_path):
-        return [], last_position
+    lines = text.splitlines(keepends=True)
+    partial = ''
+    if lines and lines[-1].splitlines()[0] == lines[-1]:
+        partial = lines.pop()
     
-    try:
-        current_size = get_file_size(file_path)
-        
-        
-        if current_size <= last_position:
-            return [], last_position
-        
-        encoding = detect_file_encoding(file_path)
-        new_lines = []
-        
-        with open(file_path, 'r', encoding=encoding, errors='replace') as file:
-            file.seek(last_position)
-            new_content = file.read(current_size - last_position)
-            
-            
-            lines = new_content.split('\n')
-            
-            
-            for line in lines:
-                cleaned_line = line.rstrip('\r\n')
-                if cleaned_line.strip():  
-                    new_lines.append(cleaned_line)
-        
-        return new_lines, current_size
-        
-    except Exception as e:
-        print(f"Error reading new lines from {file_path}: {e}")
-        return [], last_position
+    complete = []
+    for line in lines:
+        content = line.splitlines()[0]
+        if content and not content.isspace():
+            complete.append(content)
+    return complete, partial
+
+def decode_lines(data: bytes, encoding: str = 'utf-8') -> List[str]:
+    """
+    Decode raw file content and split it into non-empty lines.
+    
+    Args:
+        data: Raw bytes read from the file
+        encoding: Encoding to decode with
+    
+    Returns:
+        List of lines without line terminators, blank lines removed
+    """
+    lines, partial = split_complete_lines(data.decode(encoding, errors='replace'))
+    if partial and not partial.isspace():
+        lines.append(partial)
+    return lines
+
+def find_line_end(file_path: str, size: int) -> int:
+    """
+    Find the offset just past the last newline in the first size bytes of a file.
+    
+    Returns:
+        The offset, or 0 if there is no newline
+    """
+    with open(file_path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            read_size = min(TAIL_BYTES_PER_LINE * 16, pos)
+            f.seek(pos - read_size)
+            index = f.read(read_size).rfind(b'\n')
+            if index != -1:
+                return pos - read_size + index + 1
+            pos -= read_size
+    return 0
 
 async def ensure_log_file_exists(file_path: str) -> bool:
     """